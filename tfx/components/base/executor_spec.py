@@ -13,25 +13,36 @@
 # limitations under the License.
 """Executor specifications for defining what to to execute."""
 
-from __future__ import absolute_import
-from __future__ import division
-from __future__ import print_function
-
 import abc
 
-from six import with_metaclass
-from typing import List, Text, Type
+from typing import Any, Dict, List, Text, Type
 
 from tfx.components.base import base_executor
 from tfx.utils import json_utils
 
 
-class ExecutorSpec(with_metaclass(abc.ABCMeta, json_utils.Jsonable)):
+class ExecutorSpec(json_utils.Jsonable, metaclass=abc.ABCMeta):
   """A specification for a component executor.
 
   An instance of ExecutorSpec describes the implementation of a component.
+
+  Executor specs are created for every component class and instance, so they
+  store their fields in `__slots__` instead of a per-instance `__dict__`.
+  Subclasses should declare `__slots__` for their own fields.
   """
 
+  __slots__ = ()
+
+  def to_json_dict(self) -> Dict[Text, Any]:
+    """Convert from an object to a JSON serializable dictionary."""
+    result = {}
+    for cls in reversed(type(self).__mro__):
+      for name in cls.__dict__.get('__slots__', ()):
+        if hasattr(self, name):
+          result[name] = getattr(self, name)
+    result.update(getattr(self, '__dict__', {}))
+    return result
+
 
 class ExecutorClassSpec(ExecutorSpec):
   """A specification of executor class.
@@ -41,6 +52,8 @@ class ExecutorClassSpec(ExecutorSpec):
       this component (required).
   """
 
+  __slots__ = ('executor_class',)
+
   def __init__(self, executor_class: Type[base_executor.BaseExecutor]):
     if not executor_class:
       raise ValueError('executor_class is required')
@@ -72,6 +85,8 @@ class ExecutorContainerSpec(ExecutorSpec):
       output metadata at runtime.
   """
 
+  __slots__ = ('image', 'command', 'args')
+
   def __init__(self,
                image: Text,
                command: List[Text] = None,
@@ -0,0 +1,64 @@
+# Copyright 2019 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for tfx.components.base.executor_spec."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+from tfx.components.base import base_executor
+from tfx.components.base import executor_spec
+from tfx.utils import json_utils
+
+
+class _MyExecutor(base_executor.BaseExecutor):
+
+  def Do(self, input_dict, output_dict, exec_properties):
+    pass
+
+
+class ExecutorSpecTest(tf.test.TestCase):
+
+  def testExecutorClassSpecHasNoInstanceDict(self):
+    spec = executor_spec.ExecutorClassSpec(_MyExecutor)
+    self.assertFalse(hasattr(spec, '__dict__'))
+    self.assertEqual({'executor_class': _MyExecutor}, spec.to_json_dict())
+
+  def testExecutorClassSpecRequiresExecutorClass(self):
+    with self.assertRaises(ValueError):
+      executor_spec.ExecutorClassSpec(None)
+
+  def testExecutorClassSpecJsonRoundtrip(self):
+    spec = executor_spec.ExecutorClassSpec(_MyExecutor)
+
+    actual_spec = json_utils.loads(json_utils.dumps(spec))
+
+    self.assertIsInstance(actual_spec, executor_spec.ExecutorClassSpec)
+    self.assertEqual(_MyExecutor, actual_spec.executor_class)
+
+  def testExecutorContainerSpecJsonRoundtrip(self):
+    spec = executor_spec.ExecutorContainerSpec(
+        image='docker/whalesay', command=['cowsay'], args=['hello world'])
+
+    actual_spec = json_utils.loads(json_utils.dumps(spec))
+
+    self.assertIsInstance(actual_spec, executor_spec.ExecutorContainerSpec)
+    self.assertEqual('docker/whalesay', actual_spec.image)
+    self.assertEqual(['cowsay'], actual_spec.command)
+    self.assertEqual(['hello world'], actual_spec.args)
+
+
+if __name__ == '__main__':
+  tf.test.main()
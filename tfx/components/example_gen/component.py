@@ -13,10 +13,6 @@
 # limitations under the License.
 """TFX ExampleGen component definition."""
 
-from __future__ import absolute_import
-from __future__ import division
-from __future__ import print_function
-
 from typing import Optional, Text
 
 from tfx import types
@@ -90,8 +86,7 @@ class _QueryBasedExampleGen(base_component.BaseComponent):
         output_config=output_config,
         custom_config=custom_config,
         examples=example_artifacts)
-    super(_QueryBasedExampleGen, self).__init__(
-        spec=spec, instance_name=instance_name)
+    super().__init__(spec=spec, instance_name=instance_name)
 
 
 class FileBasedExampleGen(base_component.BaseComponent):
@@ -169,7 +164,7 @@ class FileBasedExampleGen(base_component.BaseComponent):
         output_config=output_config,
         custom_config=custom_config,
         examples=example_artifacts)
-    super(FileBasedExampleGen, self).__init__(
+    super().__init__(
         spec=spec,
         custom_executor_spec=custom_executor_spec,
         instance_name=instance_name)
@@ -97,6 +97,20 @@ class ComponentTest(tf.test.TestCase):
     self.assertEqual('train', artifact_collection[0].split)
     self.assertEqual('eval', artifact_collection[1].split)
 
+  def testConstructedArtifactsAreIndependent(self):
+    input_base = standard_artifacts.ExternalArtifact()
+    example_gen_1 = TestFileBasedExampleGenComponent(
+        input_base=channel_utils.as_channel([input_base]))
+    example_gen_2 = TestFileBasedExampleGenComponent(
+        input_base=channel_utils.as_channel([input_base]))
+    artifact_1 = example_gen_1.outputs.examples.get()[0]
+    artifact_2 = example_gen_2.outputs.examples.get()[0]
+    self.assertIsNot(artifact_1, artifact_2)
+
+    artifact_1.uri = '/path/to/examples'
+    self.assertEqual('', artifact_2.uri)
+    self.assertEqual('train', artifact_2.split)
+
   def testConstructCustomExecutor(self):
     input_base = standard_artifacts.ExternalArtifact()
     example_gen = component.FileBasedExampleGen(
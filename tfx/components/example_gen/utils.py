@@ -115,25 +115,36 @@ def generate_output_split_names(input_config: example_gen_pb2.Input,
   return result
 
 
+# Serialized default configs. They are parsed into a new message on every call
+# so that callers can freely modify the returned config.
+_DEFAULT_INPUT_CONFIG_BYTES = example_gen_pb2.Input(splits=[
+    example_gen_pb2.Input.Split(name='single_split', pattern='*')
+]).SerializeToString()
+_DEFAULT_OUTPUT_CONFIG_BYTES = example_gen_pb2.Output(
+    split_config=example_gen_pb2.SplitConfig(splits=[
+        example_gen_pb2.SplitConfig.Split(name='train', hash_buckets=2),
+        example_gen_pb2.SplitConfig.Split(name='eval', hash_buckets=1)
+    ])).SerializeToString()
+
+
 def make_default_input_config(split_pattern: Text = '*'
                              ) -> example_gen_pb2.Input:
   """Returns default input config."""
   # Treats input base dir as a single split.
-  return example_gen_pb2.Input(splits=[
-      example_gen_pb2.Input.Split(name='single_split', pattern=split_pattern)
-  ])
+  result = example_gen_pb2.Input()
+  result.ParseFromString(_DEFAULT_INPUT_CONFIG_BYTES)
+  result.splits[0].pattern = split_pattern
+  return result
 
 
 def make_default_output_config(input_config: example_gen_pb2.Input
                               ) -> example_gen_pb2.Output:
   """Returns default output config based on input config."""
+  result = example_gen_pb2.Output()
   if len(input_config.splits) > 1:
     # Returns empty output split config as output split will be same as input.
-    return example_gen_pb2.Output()
+    return result
   else:
     # Returns 'train' and 'eval' splits with size 2:1.
-    return example_gen_pb2.Output(
-        split_config=example_gen_pb2.SplitConfig(splits=[
-            example_gen_pb2.SplitConfig.Split(name='train', hash_buckets=2),
-            example_gen_pb2.SplitConfig.Split(name='eval', hash_buckets=1)
-        ]))
+    result.ParseFromString(_DEFAULT_OUTPUT_CONFIG_BYTES)
+    return result
@@ -124,6 +124,17 @@ class UtilsTest(tf.test.TestCase):
             ])))
     self.assertListEqual(['train', 'eval'], split_names)
 
+  def testMakeDefaultInputConfig(self):
+    input_config = utils.make_default_input_config()
+    self.assertEqual(1, len(input_config.splits))
+    self.assertEqual('single_split', input_config.splits[0].name)
+    self.assertEqual('*', input_config.splits[0].pattern)
+
+    input_config.splits[0].pattern = 'modified'
+    input_config = utils.make_default_input_config('split/*')
+    self.assertEqual('split/*', input_config.splits[0].pattern)
+    self.assertEqual('*', utils.make_default_input_config().splits[0].pattern)
+
   def testMakeDefaultOutputConfig(self):
     output_config = utils.make_default_output_config(
         utils.make_default_input_config())
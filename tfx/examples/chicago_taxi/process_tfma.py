@@ -95,8 +95,8 @@ def process_tfma(eval_result_dir,
           pipeline
           | 'ReadBigQuery' >> beam.io.Read(
               beam.io.BigQuerySource(query=query, use_standard_sql=True))
-          | 'CleanData' >>
-          beam.Map(lambda x: (taxi.clean_raw_data_dict(x, raw_feature_spec))))
+          | 'CleanData' >> beam.Map(
+              taxi.clean_raw_data_dict, raw_feature_spec=raw_feature_spec))
 
     # Examples must be in clean tf-example format.
     coder = taxi.make_proto_coder(schema)
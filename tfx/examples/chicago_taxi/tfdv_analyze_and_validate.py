@@ -12,22 +12,42 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 """Compute stats, infer schema, and validate stats for chicago taxi example."""
-from __future__ import absolute_import
-from __future__ import division
-from __future__ import print_function
-
 import argparse
-
+import importlib.util
+import operator
+import os
+import re
+
+
+def _has_cpp_protobuf():
+  """Returns whether the installed protobuf includes the C++ extension."""
+  try:
+    spec = importlib.util.find_spec('google.protobuf.pyext._message')
+  except ImportError:
+    return False
+  return spec is not None
+
+
+# When run as a script, prefer the C++ protobuf runtime, which encodes and
+# decodes the statistics protos much faster than the pure Python one. This has
+# to happen before any protobuf module is imported; an explicitly set
+# environment value wins. Importers of this module are left untouched.
+if __name__ == '__main__' and _has_cpp_protobuf():
+  os.environ.setdefault('PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION', 'cpp')
+  os.environ.setdefault('PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION_VERSION', '2')
+
+# pylint: disable=g-import-not-at-top,wrong-import-position
 import apache_beam as beam
 import numpy as np
+import pyarrow as pa
 import tensorflow as tf
 import tensorflow_data_validation as tfdv
 
 from tensorflow_data_validation.coders import csv_decoder
-from tensorflow_data_validation.utils import batch_util
 
 from google.protobuf import text_format
 from tensorflow.python.lib.io import file_io  # pylint: disable=g-direct-tensorflow-import
+from tensorflow_metadata.proto.v0 import schema_pb2
 from tensorflow_metadata.proto.v0 import statistics_pb2
 
 try:
@@ -37,93 +57,604 @@ try:
   from tfx.examples.chicago_taxi.trainer import taxi  # pylint: disable=g-import-not-at-top
 except ImportError:
   from trainer import taxi  # pylint: disable=g-import-not-at-top
+# pylint: enable=g-import-not-at-top,wrong-import-position
+
+# Bounds on the number of rows converted into a single Arrow table.
+_MIN_BATCH_SIZE = 1024
+_MAX_BATCH_SIZE = 8192
+
+# Extracts the values of all the columns from a BigQuery row in one call.
+_get_column_values = operator.itemgetter(*taxi.CSV_COLUMN_NAMES)
+
+# Feature types of the columns returned by taxi.make_sql.
+_INT = statistics_pb2.FeatureNameStatistics.INT
+_FLOAT = statistics_pb2.FeatureNameStatistics.FLOAT
+_STRING = statistics_pb2.FeatureNameStatistics.STRING
+_COLUMN_FEATURE_TYPES = {
+    'pickup_community_area': _STRING,
+    'fare': _FLOAT,
+    'trip_start_month': _INT,
+    'trip_start_hour': _INT,
+    'trip_start_day': _INT,
+    'trip_start_timestamp': _INT,
+    'pickup_latitude': _FLOAT,
+    'pickup_longitude': _FLOAT,
+    'dropoff_latitude': _FLOAT,
+    'dropoff_longitude': _FLOAT,
+    'trip_miles': _FLOAT,
+    'pickup_census_tract': _STRING,
+    'dropoff_census_tract': _STRING,
+    'payment_type': _STRING,
+    'company': _STRING,
+    'trip_seconds': _INT,
+    'dropoff_community_area': _STRING,
+    'tips': _FLOAT,
+}
+
+# Arrow schema of the tables built from BigQuery rows. Passing the types
+# explicitly avoids inferring them from the Python values of every batch.
+_ARROW_VALUE_TYPES = {
+    _INT: pa.int64(),
+    _FLOAT: pa.float64(),
+    _STRING: pa.string(),
+}
+_BIGQUERY_ARROW_SCHEMA = pa.schema([
+    pa.field(name, pa.list_(_ARROW_VALUE_TYPES[_COLUMN_FEATURE_TYPES[name]]))
+    for name in taxi.CSV_COLUMN_NAMES
+])
+
+# Number of quantile buckets and top values computed in BigQuery when the
+# statistics are pushed down.
+_NUM_QUANTILE_BUCKETS = 10
+_NUM_TOP_VALUES = 20
+
+# By default, csv files smaller than this many bytes are processed with
+# tfdv.generate_statistics_from_csv instead of the sharded pipeline below.
+_SMALL_CSV_MAX_BYTES = 500 * 1024 * 1024
+
+# Dataflow experiments enabled by --use_dataflow_runner_v2: Runner v2 with
+# sibling SDK worker processes, so the decode and statistics stages run in
+# separate processes spread over the cores of each worker VM. They require a
+# Beam version whose Dataflow client supports Runner v2.
+_RUNNER_V2_DATAFLOW_EXPERIMENTS = ('use_runner_v2', 'use_sibling_sdk_workers')
+
+# Suffix appended to the CSV input path to locate its sharded TFRecord cache.
+_TFRECORD_CACHE_SUFFIX = '.tfrecord'
+
+# Matches the '-SSSSS-of-NNNNN' shard name of a cache file, capturing NNNNN.
+_TFRECORD_CACHE_SHARD_RE = re.compile(r'-\d+-of-(\d+)$')
+
+# Suffix appended to the text schema path to locate its binary copy.
+_BINARY_SCHEMA_SUFFIX = '.pb'
+
+
+class _RowsToArrowTableDoFn(beam.DoFn):
+  """Accumulates BigQuery rows column-wise and emits them as Arrow tables.
+
+  The values of each row are appended to one list per column, so a table can
+  be built directly from the columns without transposing a batch of rows. Each
+  column becomes an Arrow list array, which is the input format expected by
+  tfdv.GenerateStatistics, with NULL values encoded as null lists. A table is
+  emitted every batch_size rows and at the end of each bundle.
+
+  The column types are taken from the given Arrow schema instead of being
+  inferred from the values; its fields must follow taxi.CSV_COLUMN_NAMES.
+  """
 
+  def __init__(self, schema, batch_size=_MAX_BATCH_SIZE):
+    super().__init__()
+    self._schema = schema
+    self._batch_size = batch_size
+    self._columns = None
+    self._num_rows = 0
+
+  def start_bundle(self):
+    self._reset()
+
+  def _reset(self):
+    self._columns = [[] for _ in taxi.CSV_COLUMN_NAMES]
+    self._num_rows = 0
+
+  def _flush(self):
+    arrays = [
+        pa.array(values, type=field.type)
+        for values, field in zip(self._columns, self._schema)
+    ]
+    table = pa.Table.from_arrays(arrays, schema=self._schema)
+    self._reset()
+    return table
+
+  def process(self, row):
+    for values, value in zip(self._columns, _get_column_values(row)):
+      values.append(None if value is None else [value])
+    self._num_rows += 1
+    if self._num_rows >= self._batch_size:
+      yield self._flush()
+
+  def finish_bundle(self):
+    if self._num_rows:
+      yield beam.transforms.window.GlobalWindows.windowed_value(self._flush())
+
+
+class _ExamplesToArrowTableDoFn(beam.DoFn):
+  """Converts a batch of decoded examples into an Arrow table.
+
+  Each example is a dict mapping feature names to numpy arrays, as produced by
+  the csv and tf.Example decoders. The numpy arrays of a feature are assembled
+  directly into one Arrow list array, so no intermediate per-example table is
+  built.
+  """
 
-def infer_schema(stats_path, schema_path):
-  """Infers a schema from stats in stats_path.
+  def process(self, examples):
+    arrays = []
+    for column in taxi.CSV_COLUMN_NAMES:
+      arrays.append(pa.array([example.get(column) for example in examples]))
+    yield pa.Table.from_arrays(arrays, taxi.CSV_COLUMN_NAMES)
+
+
+class _ArrowTableCoder(beam.coders.Coder):
+  """Coder for Arrow tables using the Arrow IPC stream format.
+
+  Decoding wraps the encoded bytes in an Arrow buffer, so the columns of the
+  decoded table point into the encoded data instead of being copied out of it.
+  """
+
+  def encode(self, table):
+    sink = pa.BufferOutputStream()
+    writer = pa.RecordBatchStreamWriter(sink, table.schema)
+    writer.write_table(table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+  def decode(self, encoded):
+    return pa.ipc.open_stream(pa.py_buffer(encoded)).read_all()
+
+
+@beam.ptransform_fn
+def _ReadAndDecodeCsv(pipeline, input_handle):
+  """Reads csv files matching input_handle in parallel and decodes them.
+
+  The file pattern is expanded and split into ranges that are read in parallel,
+  and the lines are reshuffled before decoding so that the decode step is not
+  fused with the read and can be spread across workers.
 
   Args:
-    stats_path: Location of the stats used to infer the schema.
-    schema_path: Location where the inferred schema is materialized.
+    pipeline: Beam pipeline.
+    input_handle: Path or file pattern of csv files with input data.
+
+  Returns:
+    PCollection of dicts mapping column names to numpy arrays.
+  """
+  return (pipeline
+          | 'CreateFilePattern' >> beam.Create([input_handle])
+          | 'ReadLines' >> beam.io.ReadAllFromText(skip_header_lines=1)
+          | 'ReshuffleLines' >> beam.Reshuffle()
+          | 'DecodeLines' >>
+          csv_decoder.DecodeCSVToDict(column_names=taxi.CSV_COLUMN_NAMES))
+
+
+@beam.ptransform_fn
+def _GenerateStatistics(tables):
+  """Computes statistics over Arrow tables in a stage separate from decoding.
+
+  The reshuffle breaks fusion between producing the tables and computing the
+  statistics, so the runner can run both stages concurrently on different
+  workers instead of alternating between them. With the DirectRunner, pass
+  e.g. --direct_num_workers and --direct_running_mode=multi_processing in the
+  pipeline args to get the same effect locally.
+
+  Reshuffle does not keep the element type of its input, so the tables are
+  explicitly encoded as Arrow IPC streams around it rather than being pickled.
+
+  Args:
+    tables: PCollection of Arrow tables.
+
+  Returns:
+    PCollection with a single DatasetFeatureStatisticsList.
+  """
+  coder = _ArrowTableCoder()
+  return (tables
+          | 'EncodeTables' >> beam.Map(coder.encode).with_output_types(bytes)
+          | 'PrefetchBatches' >> beam.Reshuffle()
+          | 'DecodeTables' >> beam.Map(coder.decode).with_output_types(pa.Table)
+          | 'GenerateStatistics' >> tfdv.GenerateStatistics())
+
+
+def _decoded_csv_to_example(instance):
+  """Converts a dict of numpy arrays decoded from CSV to a tf.train.Example."""
+  feature = {}
+  for key, value in instance.items():
+    if value is None:
+      continue
+    if np.issubdtype(value.dtype, np.integer):
+      feature[key] = tf.train.Feature(
+          int64_list=tf.train.Int64List(value=value.tolist()))
+    elif np.issubdtype(value.dtype, np.floating):
+      feature[key] = tf.train.Feature(
+          float_list=tf.train.FloatList(value=value.tolist()))
+    else:
+      feature[key] = tf.train.Feature(
+          bytes_list=tf.train.BytesList(value=value.tolist()))
+  return tf.train.Example(features=tf.train.Features(feature=feature))
+
+
+def _write_tfrecord_cache(input_handle, cache_prefix, pipeline_args=None):
+  """Converts the CSV input into sharded TFRecords of tf.train.Example.
+
+  Args:
+    input_handle: Path to csv file with input data.
+    cache_prefix: Prefix of the TFRecord shards to write.
+    pipeline_args: additional DataflowRunner or DirectRunner args passed to the
+      beam pipeline.
   """
+  with beam.Pipeline(argv=pipeline_args) as pipeline:
+    _ = (
+        pipeline
+        | 'ReadData' >> _ReadAndDecodeCsv(input_handle)
+        | 'ToTFExample' >> beam.Map(_decoded_csv_to_example)
+        | 'WriteTFRecordCache' >> beam.io.WriteToTFRecord(
+            cache_prefix,
+            shard_name_template='-SSSSS-of-NNNNN',
+            coder=beam.coders.ProtoCoder(tf.train.Example)))
+
+
+def _make_pushdown_sql(query):
+  """Creates a query computing summary statistics of the query rows in BigQuery.
+
+  Args:
+    query: Query returning the rows to compute the statistics over.
+
+  Returns:
+    sql command as string, returning a single row with the statistics.
+  """
+  aggregates = ['COUNT(*) AS num_examples']
+  for column in taxi.CSV_COLUMN_NAMES:
+    if _COLUMN_FEATURE_TYPES[column] == _STRING:
+      templates = [
+          'COUNTIF({c} IS NULL) AS {c}_num_missing',
+          'APPROX_COUNT_DISTINCT({c}) AS {c}_unique',
+          'APPROX_TOP_COUNT({c}, {k}) AS {c}_top_values',
+          'AVG(LENGTH({c})) AS {c}_avg_length',
+      ]
+    else:
+      templates = [
+          'COUNTIF({c} IS NULL) AS {c}_num_missing',
+          'AVG({c}) AS {c}_mean',
+          'STDDEV_POP({c}) AS {c}_std_dev',
+          'COUNTIF({c} = 0) AS {c}_num_zeros',
+          'MIN({c}) AS {c}_min',
+          'MAX({c}) AS {c}_max',
+          'APPROX_QUANTILES({c}, {q}) AS {c}_quantiles',
+      ]
+    aggregates.extend(
+        template.format(
+            c=column, k=_NUM_TOP_VALUES + 1, q=_NUM_QUANTILE_BUCKETS)
+        for template in templates)
+  return 'SELECT\n  {aggregates}\nFROM ({query})'.format(
+      aggregates=',\n  '.join(aggregates), query=query)
+
+
+def _pushdown_row_to_stats(row):
+  """Assembles the statistics proto from the result of the pushdown query."""
+  num_examples = row['num_examples']
+  dataset = statistics_pb2.DatasetFeatureStatistics(num_examples=num_examples)
+  for column in taxi.CSV_COLUMN_NAMES:
+    feature_type = _COLUMN_FEATURE_TYPES[column]
+    feature = dataset.features.add(name=column, type=feature_type)
+    num_missing = row[column + '_num_missing']
+    num_non_missing = num_examples - num_missing
+    num_values = 1 if num_non_missing else 0
+    common_stats = statistics_pb2.CommonStatistics(
+        num_non_missing=num_non_missing,
+        num_missing=num_missing,
+        min_num_values=num_values,
+        max_num_values=num_values,
+        avg_num_values=num_values,
+        tot_num_values=num_non_missing)
+
+    if feature_type == _STRING:
+      string_stats = feature.string_stats
+      string_stats.common_stats.CopyFrom(common_stats)
+      string_stats.unique = row[column + '_unique'] or 0
+      string_stats.avg_length = row[column + '_avg_length'] or 0
+      # APPROX_TOP_COUNT counts NULL like any other value, so it is asked for
+      # one extra entry and NULL is dropped here.
+      top_values = [
+          top_value for top_value in row[column + '_top_values'] or []
+          if top_value['value'] is not None
+      ][:_NUM_TOP_VALUES]
+      for rank, top_value in enumerate(top_values):
+        string_stats.top_values.add(
+            value=top_value['value'], frequency=top_value['count'])
+        string_stats.rank_histogram.buckets.add(
+            low_rank=rank,
+            high_rank=rank,
+            label=top_value['value'],
+            sample_count=top_value['count'])
+    else:
+      num_stats = feature.num_stats
+      num_stats.common_stats.CopyFrom(common_stats)
+      num_stats.mean = row[column + '_mean'] or 0
+      num_stats.std_dev = row[column + '_std_dev'] or 0
+      num_stats.num_zeros = row[column + '_num_zeros']
+      num_stats.min = row[column + '_min'] or 0
+      num_stats.max = row[column + '_max'] or 0
+      quantiles = row[column + '_quantiles'] or []
+      if quantiles:
+        num_stats.median = quantiles[len(quantiles) // 2]
+        histogram = num_stats.histograms.add(
+            type=statistics_pb2.Histogram.QUANTILES)
+        sample_count = float(num_non_missing) / (len(quantiles) - 1)
+        for low_value, high_value in zip(quantiles[:-1], quantiles[1:]):
+          histogram.buckets.add(
+              low_value=low_value,
+              high_value=high_value,
+              sample_count=sample_count)
+  return statistics_pb2.DatasetFeatureStatisticsList(datasets=[dataset])
+
+
+def _load_statistics(stats_path):
+  """Loads the binary statistics proto written by compute_stats."""
+  return statistics_pb2.DatasetFeatureStatisticsList.FromString(
+      file_io.FileIO(stats_path, 'rb').read())
+
+
+def _infer_schema_from_stats(stats, schema_path, verbose=False):
+  """Infers a schema from the loaded stats and materializes it."""
   print('Infering schema from statistics.')
-  schema = tfdv.infer_schema(
-      tfdv.load_statistics(stats_path), infer_feature_shape=False)
-  print(text_format.MessageToString(schema))
+  schema = tfdv.infer_schema(stats, infer_feature_shape=False)
+  schema_text = text_format.MessageToString(schema)
+  if verbose:
+    print(schema_text)
 
   print('Writing schema to output path.')
-  file_io.write_string_to_file(schema_path, text_format.MessageToString(schema))
+  file_io.write_string_to_file(schema_path, schema_text)
+  return schema
+
+
+def _validate_stats_against_schema(stats, schema, anomalies_path,
+                                   verbose=False):
+  """Validates the loaded stats against schema and materializes anomalies."""
+  print('Validating schema against the computed statistics.')
+  anomalies = tfdv.validate_statistics(stats, schema)
+  anomalies_text = text_format.MessageToString(anomalies)
+  if verbose:
+    print('Detected following anomalies:')
+    print(anomalies_text)
+
+  print('Writing anomalies to anomalies path.')
+  file_io.write_string_to_file(anomalies_path, anomalies_text)
+
+
+def _is_newer(path, other_path):
+  """Returns whether path was modified no earlier than other_path."""
+  return file_io.stat(path).mtime_nsec >= file_io.stat(other_path).mtime_nsec
+
+
+def _read_schema(schema_path):
+  """Reads the schema, preferring a binary copy next to the text schema.
 
+  Parsing the text format is much slower than parsing the binary format, so
+  the first read stores a binary copy of the schema at schema_path + '.pb',
+  if that location is writable. The binary copy is only used while it is newer
+  than the text schema.
 
-def validate_stats(stats_path, schema_path, anomalies_path):
+  Args:
+    schema_path: Location of the text format schema.
+
+  Returns:
+    An instance of Schema.
+  """
+  binary_path = schema_path + _BINARY_SCHEMA_SUFFIX
+  if file_io.file_exists(binary_path) and _is_newer(binary_path, schema_path):
+    schema = schema_pb2.Schema()
+    schema.ParseFromString(file_io.FileIO(binary_path, 'rb').read())
+    return schema
+
+  schema = taxi.read_schema(schema_path)
+  try:
+    file_io.write_string_to_file(binary_path, schema.SerializeToString())
+  except tf.errors.OpError as e:
+    # The binary copy is only an optimization, e.g. the schema may live in a
+    # location that is readable but not writable.
+    tf.logging.warning('Failed to write binary schema copy to %s: %s',
+                       binary_path, e)
+  return schema
+
+
+def infer_schema(stats_path, schema_path, verbose=False):
+  """Infers a schema from stats in stats_path.
+
+  Args:
+    stats_path: Location of the stats used to infer the schema.
+    schema_path: Location where the inferred schema is materialized.
+    verbose: If true, also prints the inferred schema.
+  """
+  _infer_schema_from_stats(
+      _load_statistics(stats_path), schema_path, verbose=verbose)
+
+
+def validate_stats(stats_path, schema_path, anomalies_path, verbose=False):
   """Validates the statistics against the schema and materializes anomalies.
 
   Args:
     stats_path: Location of the stats used to infer the schema.
     schema_path: Location of the schema to be used for validation.
     anomalies_path: Location where the detected anomalies are materialized.
+    verbose: If true, also prints the detected anomalies.
   """
-  print('Validating schema against the computed statistics.')
-  schema = taxi.read_schema(schema_path)
+  schema = _read_schema(schema_path)
+  _validate_stats_against_schema(
+      _load_statistics(stats_path), schema, anomalies_path,
+      verbose=verbose)
 
-  stats = tfdv.load_statistics(stats_path)
-  anomalies = tfdv.validate_statistics(stats, schema)
-  print('Detected following anomalies:')
-  print(text_format.MessageToString(anomalies))
 
-  print('Writing anomalies to anomalies path.')
-  file_io.write_string_to_file(anomalies_path,
-                               text_format.MessageToString(anomalies))
+def infer_and_validate(stats_path, schema_path, anomalies_path, verbose=False):
+  """Infers a schema from the stats and validates the stats against it.
+
+  The stats are loaded only once and shared by schema inference and validation.
+
+  Args:
+    stats_path: Location of the stats used to infer the schema.
+    schema_path: Location where the inferred schema is materialized.
+    anomalies_path: Location where the detected anomalies are materialized.
+    verbose: If true, also prints the inferred schema and detected anomalies.
+  """
+  stats = _load_statistics(stats_path)
+  schema = _infer_schema_from_stats(stats, schema_path, verbose=verbose)
+  _validate_stats_against_schema(
+      stats, schema, anomalies_path, verbose=verbose)
+
+
+def _is_tfrecord_cache_valid(cache_files, input_handle):
+  """Returns whether cache_files are all the shards of an up-to-date cache."""
+  if not cache_files:
+    return False
+  for cache_file in cache_files:
+    # A missing shard, e.g. from an interrupted write, leaves fewer files than
+    # the shard count recorded in the file names.
+    match = _TFRECORD_CACHE_SHARD_RE.search(cache_file)
+    if not match or int(match.group(1)) != len(cache_files):
+      return False
+    if not _is_newer(cache_file, input_handle):
+      return False
+  return True
+
+
+def _is_small_file(path, max_bytes):
+  """Returns whether path is a single file smaller than max_bytes."""
+  return file_io.file_exists(path) and file_io.stat(path).length < max_bytes
 
 
 def compute_stats(input_handle,
                   stats_path,
                   max_rows=None,
                   for_eval=False,
+                  use_tfrecord_cache=False,
+                  use_bq_pushdown=False,
+                  small_csv_max_bytes=_SMALL_CSV_MAX_BYTES,
                   pipeline_args=None):
   """Computes statistics on the input data.
 
   Args:
     input_handle: BigQuery table name to process specified as DATASET.TABLE or
       path to csv file with input data.
-    stats_path: Directory in which stats are materialized.
+    stats_path: Location where the stats are materialized as a single binary
+      DatasetFeatureStatisticsList proto.
     max_rows: Number of rows to query from BigQuery
     for_eval: Query for eval set rows from BigQuery
+    use_tfrecord_cache: If true and the input is a csv file, read the examples
+      from a sharded TFRecord copy of the csv file, creating it first if it
+      does not exist yet, is incomplete or is older than the csv file. Only
+      supported for a single csv file, not a file pattern.
+    use_bq_pushdown: If true and the input is a BigQuery table, compute
+      approximate summary statistics in BigQuery instead of reading all the
+      rows into the pipeline.
+    small_csv_max_bytes: Csv files smaller than this many bytes are processed
+      with tfdv.generate_statistics_from_csv instead of the parallel pipeline.
     pipeline_args: additional DataflowRunner or DirectRunner args passed to the
       beam pipeline.
+
+  Raises:
+    ValueError: If use_tfrecord_cache is set for a csv file pattern.
   """
+  is_csv = input_handle.lower().endswith('csv')
+  if is_csv and use_tfrecord_cache and re.search(r'[*?[]', input_handle):
+    # The cache is keyed by the input path and checked against its mtime,
+    # neither of which is meaningful for a pattern.
+    raise ValueError(
+        'The TFRecord cache requires a single csv file, got pattern {}'.format(
+            input_handle))
+  if (is_csv and not use_tfrecord_cache and
+      _is_small_file(input_handle, small_csv_max_bytes)):
+    # Small inputs don't benefit from parallel reads and batching, whose setup
+    # cost dominates the run time, so use the simpler TFDV utility instead.
+    # Column names are taken from the header line, which TFDV then skips.
+    stats = tfdv.generate_statistics_from_csv(
+        data_location=input_handle,
+        pipeline_options=beam.options.pipeline_options.PipelineOptions(
+            pipeline_args))
+    file_io.write_string_to_file(stats_path, stats.SerializeToString())
+    return
+
+  cache_pattern = None
+  if is_csv and use_tfrecord_cache:
+    cache_prefix = input_handle + _TFRECORD_CACHE_SUFFIX
+    cache_pattern = cache_prefix + '-*'
+    cache_files = file_io.get_matching_files(cache_pattern)
+    if not _is_tfrecord_cache_valid(cache_files, input_handle):
+      print('Writing TFRecord cache of the input data.')
+      # Stale shards are removed first, as the new cache may have fewer shards.
+      for cache_file in cache_files:
+        file_io.delete_file(cache_file)
+      _write_tfrecord_cache(input_handle, cache_prefix, pipeline_args)
 
   with beam.Pipeline(argv=pipeline_args) as pipeline:
-    if input_handle.lower().endswith('csv'):
-      raw_data = (
-          pipeline
-          | 'ReadData' >> beam.io.textio.ReadFromText(
-              file_pattern=input_handle, skip_header_lines=1)
-          | 'DecodeData' >>
-          csv_decoder.DecodeCSVToDict(column_names=taxi.CSV_COLUMN_NAMES))
+    if is_csv:
+      if cache_pattern:
+        examples = (
+            pipeline
+            | 'ReadCachedData' >> beam.io.tfrecordio.ReadFromTFRecord(
+                file_pattern=cache_pattern)
+            | 'DecodeData' >> tfdv.DecodeTFExample())
+      else:
+        examples = pipeline | 'ReadData' >> _ReadAndDecodeCsv(input_handle)
+      stats = (
+          examples
+          | 'BatchExamples' >> beam.BatchElements(
+              min_batch_size=_MIN_BATCH_SIZE, max_batch_size=_MAX_BATCH_SIZE)
+          | 'ConvertToArrowTables' >> beam.ParDo(
+              _ExamplesToArrowTableDoFn()).with_output_types(pa.Table)
+          | 'GenerateStatistics' >> _GenerateStatistics())
     else:
       query = taxi.make_sql(
           table_name=input_handle, max_rows=max_rows, for_eval=for_eval)
-      raw_data = (
-          pipeline
-          | 'ReadBigQuery' >> beam.io.Read(
-              beam.io.BigQuerySource(query=query, use_standard_sql=True))
-          | 'ConvertToTFDVInput' >> beam.Map(
-              lambda x: {key: np.asarray([x[key]])  # pylint: disable=g-long-lambda
-                         for key in x if x[key] is not None}))
+      if use_bq_pushdown:
+        stats = (
+            pipeline
+            | 'ReadBigQueryStatistics' >> beam.io.Read(
+                beam.io.BigQuerySource(
+                    query=_make_pushdown_sql(query), use_standard_sql=True))
+            | 'AssembleStatistics' >> beam.Map(_pushdown_row_to_stats))
+      else:
+        stats = (
+            pipeline
+            | 'ReadBigQuery' >> beam.io.Read(
+                beam.io.BigQuerySource(query=query, use_standard_sql=True))
+            | 'ConvertToArrowTables' >> beam.ParDo(
+                _RowsToArrowTableDoFn(
+                    _BIGQUERY_ARROW_SCHEMA)).with_output_types(pa.Table)
+            | 'GenerateStatistics' >> _GenerateStatistics())
 
     _ = (
-        raw_data
-        |
-        'BatchExamplesToArrowTables' >> batch_util.BatchExamplesToArrowTables()
-        | 'GenerateStatistics' >> tfdv.GenerateStatistics()
-        | 'WriteStatsOutput' >> beam.io.WriteToTFRecord(
+        stats
+        | 'WriteStatsOutput' >> beam.io.WriteToText(
             stats_path,
             shard_name_template='',
+            append_trailing_newlines=False,
             coder=beam.coders.ProtoCoder(
                 statistics_pb2.DatasetFeatureStatisticsList)))
 
 
+def _with_runner_v2_experiments(pipeline_args):
+  """Adds the Runner v2 Dataflow experiments missing from pipeline_args."""
+  pipeline_args = list(pipeline_args or [])
+  options = beam.options.pipeline_options.PipelineOptions(pipeline_args)
+  runner = options.view_as(
+      beam.options.pipeline_options.StandardOptions).runner or ''
+  if 'dataflow' not in runner.lower():
+    return pipeline_args
+  # A single --experiments flag may hold several comma separated experiments.
+  experiments = set()
+  for value in options.view_as(
+      beam.options.pipeline_options.DebugOptions).experiments or []:
+    experiments.update(value.split(','))
+  for experiment in _RUNNER_V2_DATAFLOW_EXPERIMENTS:
+    if experiment not in experiments:
+      pipeline_args.append('--experiments=' + experiment)
+  return pipeline_args
+
+
 def main():
   tf.logging.set_verbosity(tf.logging.INFO)
 
@@ -142,6 +673,33 @@ def main():
       help='Query for eval set rows from BigQuery',
       action='store_true')
 
+  parser.add_argument(
+      '--use_tfrecord_cache',
+      help=('If specified, csv input is read from a sharded TFRecord copy '
+            'that is created next to the input on the first run.'),
+      action='store_true')
+
+  parser.add_argument(
+      '--use_bq_pushdown',
+      help=('If specified, approximate statistics of the BigQuery input are '
+            'computed in BigQuery instead of in the Beam pipeline.'),
+      action='store_true')
+
+  parser.add_argument(
+      '--use_dataflow_runner_v2',
+      help=('If specified and the runner is Dataflow, enables the Runner v2 '
+            'and sibling SDK worker experiments. Requires a Beam version '
+            'that supports Runner v2.'),
+      action='store_true')
+
+  parser.add_argument(
+      '--small_csv_max_bytes',
+      help=('Csv files smaller than this many bytes are processed with '
+            'tfdv.generate_statistics_from_csv instead of the parallel '
+            'pipeline.'),
+      default=_SMALL_CSV_MAX_BYTES,
+      type=int)
+
   parser.add_argument(
       '--max_rows',
       help='Number of rows to query from BigQuery',
@@ -164,6 +722,11 @@ def main():
       help='If specified, also validates the stats against the schema.',
       action='store_true')
 
+  parser.add_argument(
+      '--verbose',
+      help='If specified, prints the inferred schema and detected anomalies.',
+      action='store_true')
+
   parser.add_argument(
       '--anomalies_path',
       help='Location for detected anomalies are materialized.',
@@ -171,23 +734,36 @@ def main():
       type=str)
 
   known_args, pipeline_args = parser.parse_known_args()
+  if known_args.use_dataflow_runner_v2:
+    pipeline_args = _with_runner_v2_experiments(pipeline_args)
   compute_stats(
       input_handle=known_args.input,
       stats_path=known_args.stats_path,
       max_rows=known_args.max_rows,
       for_eval=known_args.for_eval,
+      use_tfrecord_cache=known_args.use_tfrecord_cache,
+      use_bq_pushdown=known_args.use_bq_pushdown,
+      small_csv_max_bytes=known_args.small_csv_max_bytes,
       pipeline_args=pipeline_args)
   print('Stats computation done.')
 
-  if known_args.infer_schema:
+  if known_args.infer_schema and known_args.validate_stats:
+    infer_and_validate(
+        stats_path=known_args.stats_path,
+        schema_path=known_args.schema_path,
+        anomalies_path=known_args.anomalies_path,
+        verbose=known_args.verbose)
+  elif known_args.infer_schema:
     infer_schema(
-        stats_path=known_args.stats_path, schema_path=known_args.schema_path)
-
-  if known_args.validate_stats:
+        stats_path=known_args.stats_path,
+        schema_path=known_args.schema_path,
+        verbose=known_args.verbose)
+  elif known_args.validate_stats:
     validate_stats(
         stats_path=known_args.stats_path,
         schema_path=known_args.schema_path,
-        anomalies_path=known_args.anomalies_path)
+        anomalies_path=known_args.anomalies_path,
+        verbose=known_args.verbose)
 
 
 if __name__ == '__main__':
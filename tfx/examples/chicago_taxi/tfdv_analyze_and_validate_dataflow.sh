@@ -39,7 +39,7 @@ echo TFDV output path: $TFDV_OUTPUT_PATH
 python tfdv_analyze_and_validate.py \
   --input bigquery-public-data.chicago_taxi_trips.taxi_trips \
   --infer_schema \
-  --stats_path $TFDV_OUTPUT_PATH/train_stats.tfrecord \
+  --stats_path $TFDV_OUTPUT_PATH/train_stats.pb \
   --schema_path $SCHEMA_PATH \
   --project $MYPROJECT \
   --region us-central1 \
@@ -58,7 +58,7 @@ python tfdv_analyze_and_validate.py \
   --for_eval \
   --schema_path $SCHEMA_PATH \
   --validate_stats \
-  --stats_path $TFDV_OUTPUT_PATH/eval_stats.tfrecord \
+  --stats_path $TFDV_OUTPUT_PATH/eval_stats.pb \
   --anomalies_path $TFDV_OUTPUT_PATH/anomalies.pbtxt \
   --project $MYPROJECT \
   --region us-central1 \
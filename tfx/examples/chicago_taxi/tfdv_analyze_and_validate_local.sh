@@ -24,7 +24,7 @@ echo Starting local TFDV preprocessing...
 rm -R -f $OUTPUT_DIR
 python tfdv_analyze_and_validate.py \
   --input $DATA_DIR/train/data.csv \
-  --stats_path $OUTPUT_DIR/train_stats.tfrecord \
+  --stats_path $OUTPUT_DIR/train_stats.pb \
   --infer_schema \
   --schema_path $SCHEMA_PATH \
   --runner DirectRunner
@@ -32,7 +32,7 @@ python tfdv_analyze_and_validate.py \
 # Compute stats on the eval file and validate against the training schema.
 python tfdv_analyze_and_validate.py \
   --input $DATA_DIR/eval/data.csv \
-  --stats_path $OUTPUT_DIR/eval_stats.tfrecord \
+  --stats_path $OUTPUT_DIR/eval_stats.pb \
   --validate_stats \
   --schema_path $SCHEMA_PATH \
   --anomalies_path $OUTPUT_DIR/anomalies.pbtxt \
@@ -36,7 +36,7 @@ mkdir -p $OUTPUT_DIR
 
 $(pwd)/execute_on_portable_beam.sh tfdv_analyze_and_validate.py \
             --infer_schema \
-            --stats_path $TFDV_OUTPUT_PATH/train_stats.tfrecord \
+            --stats_path $TFDV_OUTPUT_PATH/train_stats.pb \
             --schema_path $SCHEMA_PATH \
             --save_main_session True \
             --input $DATA_DIR/train/data.csv
@@ -44,7 +44,7 @@ $(pwd)/execute_on_portable_beam.sh tfdv_analyze_and_validate.py \
 $(pwd)/execute_on_portable_beam.sh tfdv_analyze_and_validate.py \
             --for_eval \
             --validate_stats \
-            --stats_path $TFDV_OUTPUT_PATH/eval_stats.tfrecord \
+            --stats_path $TFDV_OUTPUT_PATH/eval_stats.pb \
             --schema_path $SCHEMA_PATH \
             --anomalies_path $TFDV_OUTPUT_PATH/anomalies.pbtxt \
             --save_main_session True \
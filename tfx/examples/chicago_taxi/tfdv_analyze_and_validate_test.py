@@ -0,0 +1,518 @@
+# Copyright 2019 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for tfx.examples.chicago_taxi.tfdv_analyze_and_validate."""
+
+import csv
+import os
+import re
+import shutil
+
+import apache_beam as beam
+from apache_beam.testing import util
+import numpy as np
+import pyarrow as pa
+import tensorflow as tf
+
+from google.protobuf import text_format
+from tensorflow.python.lib.io import file_io  # pylint: disable=g-direct-tensorflow-import
+from tensorflow_metadata.proto.v0 import schema_pb2
+from tensorflow_metadata.proto.v0 import statistics_pb2
+from tfx.examples.chicago_taxi import tfdv_analyze_and_validate
+from tfx.examples.chicago_taxi.trainer import taxi
+
+_DATA_DIR_PATH = os.path.join(os.path.dirname(__file__), 'data')
+_TRAIN_DATA_PATH = os.path.join(_DATA_DIR_PATH, 'train', 'data.csv')
+
+_INT = statistics_pb2.FeatureNameStatistics.INT
+_FLOAT = statistics_pb2.FeatureNameStatistics.FLOAT
+_STRING = statistics_pb2.FeatureNameStatistics.STRING
+
+_NUMERIC_ALIASES = ('num_missing', 'mean', 'std_dev', 'num_zeros', 'min', 'max',
+                    'quantiles')
+_STRING_ALIASES = ('num_missing', 'unique', 'top_values', 'avg_length')
+
+
+def _num_csv_rows(path):
+  with open(path) as f:
+    return len(list(csv.reader(f))) - 1
+
+
+def _all_null_pushdown_row(num_examples):
+  """Returns a pushdown query result row in which every column is NULL."""
+  row = {'num_examples': num_examples}
+  for column in taxi.CSV_COLUMN_NAMES:
+    row[column + '_num_missing'] = num_examples
+    if tfdv_analyze_and_validate._COLUMN_FEATURE_TYPES[column] == _STRING:
+      row[column + '_unique'] = 0
+      row[column + '_top_values'] = None
+      row[column + '_avg_length'] = None
+    else:
+      row[column + '_mean'] = None
+      row[column + '_std_dev'] = None
+      row[column + '_num_zeros'] = 0
+      row[column + '_min'] = None
+      row[column + '_max'] = None
+      row[column + '_quantiles'] = None
+  return row
+
+
+def _bigquery_row(null_columns=()):
+  """Returns a BigQuery result row with NULLs in the given columns."""
+  values = {_INT: 1, _FLOAT: 1.5, _STRING: 'a'}
+  return {
+      column: None if column in null_columns else
+      values[tfdv_analyze_and_validate._COLUMN_FEATURE_TYPES[column]]
+      for column in taxi.CSV_COLUMN_NAMES
+  }
+
+
+def _column(tables, name):
+  """Returns the values of a column concatenated over the given tables."""
+  index = taxi.CSV_COLUMN_NAMES.index(name)
+  result = []
+  for table in tables:
+    result.extend(table.column(index).to_pylist())
+  return result
+
+
+def _feature_types(stats):
+  return {
+      feature.name: feature.type for feature in stats.datasets[0].features
+  }
+
+
+class TfdvAnalyzeAndValidateTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._working_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    file_io.recursive_create_dir(self._working_dir)
+
+  def _assertTrainStats(self, stats):
+    self.assertEqual(
+        _num_csv_rows(_TRAIN_DATA_PATH), stats.datasets[0].num_examples)
+    feature_types = _feature_types(stats)
+    self.assertCountEqual(taxi.CSV_COLUMN_NAMES, feature_types.keys())
+    self.assertEqual(_FLOAT, feature_types['fare'])
+    self.assertEqual(_FLOAT, feature_types['trip_miles'])
+    self.assertEqual(_INT, feature_types['trip_start_hour'])
+    self.assertEqual(_INT, feature_types['trip_seconds'])
+
+  def testRowsToArrowTableDoFn(self):
+    rows = [
+        _bigquery_row(),
+        _bigquery_row(null_columns=('fare', 'company')),
+        _bigquery_row(null_columns=set(taxi.CSV_COLUMN_NAMES) -
+                      {'trip_seconds'}),
+    ]
+    schema = tfdv_analyze_and_validate._BIGQUERY_ARROW_SCHEMA
+
+    with beam.Pipeline() as pipeline:
+      tables = (
+          pipeline
+          | beam.Create(rows)
+          | beam.ParDo(
+              tfdv_analyze_and_validate._RowsToArrowTableDoFn(
+                  schema, batch_size=2)).with_output_types(pa.Table))
+
+      def check_result(got):
+        # We use Python assertion here to avoid Beam serialization error in
+        # pickling tf.test.TestCase.
+        assert len(got) >= 2, 'Expected at least two tables'
+        assert all(table.num_rows <= 2 for table in got), 'Table too large'
+        assert sum(table.num_rows for table in got) == 3, 'Rows lost'
+        assert all(table.schema.equals(schema) for table in got), (
+            'Unexpected schema')
+        assert sorted(_column(got, 'fare'), key=str) == [
+            None, None, [1.5]], 'Unexpected fare values'
+        assert sorted(_column(got, 'company'), key=str) == [
+            None, None, ['a']], 'Unexpected company values'
+        assert _column(got, 'trip_seconds') == [[1], [1], [1]], (
+            'Unexpected trip_seconds values')
+
+      util.assert_that(tables, check_result)
+
+  def testExamplesToArrowTableDoFn(self):
+    examples = [
+        {
+            'fare': np.array([1.5], dtype=np.float32),
+            'company': np.array([b'a'], dtype=object),
+            'trip_seconds': np.array([1], dtype=np.int64),
+        },
+        {
+            'company': None,
+            'trip_seconds': np.array([2, 3], dtype=np.int64),
+        },
+    ]
+
+    with beam.Pipeline() as pipeline:
+      tables = (
+          pipeline
+          | beam.Create([examples])
+          | beam.ParDo(tfdv_analyze_and_validate._ExamplesToArrowTableDoFn())
+          .with_output_types(pa.Table))
+
+      def check_result(got):
+        # We use Python assertion here to avoid Beam serialization error in
+        # pickling tf.test.TestCase.
+        assert len(got) == 1, 'Expected one table'
+        table = got[0]
+        assert table.num_rows == 2, 'Unexpected row count'
+        assert table.schema.names == taxi.CSV_COLUMN_NAMES, 'Unexpected names'
+        assert table.schema.field_by_name('fare').type == pa.list_(
+            pa.float32()), 'Unexpected fare type'
+        assert table.schema.field_by_name('company').type == pa.list_(
+            pa.binary()), 'Unexpected company type'
+        assert _column(got, 'fare') == [[1.5], None], 'Unexpected fare'
+        assert _column(got, 'company') == [[b'a'], None], 'Unexpected company'
+        assert _column(got, 'trip_seconds') == [[1], [2, 3]], (
+            'Unexpected trip_seconds')
+        assert _column(got, 'tips') == [None, None], 'Unexpected tips'
+
+      util.assert_that(tables, check_result)
+
+  def testArrowTableCoderRoundTrip(self):
+    table = pa.Table.from_arrays([
+        pa.array([[1], None, [3]], type=pa.list_(pa.int64())),
+        pa.array([[b'a'], [b'b'], None], type=pa.list_(pa.binary())),
+    ], ['int_feature', 'bytes_feature'])
+    coder = tfdv_analyze_and_validate._ArrowTableCoder()
+
+    decoded = coder.decode(coder.encode(table))
+
+    self.assertTrue(table.schema.equals(decoded.schema))
+    self.assertTrue(table.equals(decoded))
+
+  def _copyTrainData(self):
+    input_path = os.path.join(self._working_dir, 'data.csv')
+    shutil.copy(_TRAIN_DATA_PATH, input_path)
+    return input_path
+
+  def testDecodedCsvToExample(self):
+    example = tfdv_analyze_and_validate._decoded_csv_to_example({
+        'int_feature': np.array([1, 2], dtype=np.int64),
+        'float_feature': np.array([0.5], dtype=np.float32),
+        'bytes_feature': np.array([b'a'], dtype=object),
+        'missing_feature': None,
+    })
+    feature = example.features.feature
+    self.assertEqual([1, 2], list(feature['int_feature'].int64_list.value))
+    self.assertEqual([0.5], list(feature['float_feature'].float_list.value))
+    self.assertEqual([b'a'], list(feature['bytes_feature'].bytes_list.value))
+    self.assertNotIn('missing_feature', feature)
+
+  def testComputeStatsWithTFRecordCache(self):
+    input_path = self._copyTrainData()
+    cache_pattern = input_path + '.tfrecord-*'
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=input_path, stats_path=stats_path, use_tfrecord_cache=True)
+    self.assertTrue(file_io.get_matching_files(cache_pattern))
+    cached_stats = tfdv_analyze_and_validate._load_statistics(stats_path)
+
+    direct_stats_path = os.path.join(self._working_dir, 'direct_stats.pb')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=input_path, stats_path=direct_stats_path)
+    direct_stats = tfdv_analyze_and_validate._load_statistics(
+        direct_stats_path)
+
+    self._assertTrainStats(cached_stats)
+    self.assertEqual(direct_stats.datasets[0].num_examples,
+                     cached_stats.datasets[0].num_examples)
+    self.assertEqual(
+        _feature_types(direct_stats), _feature_types(cached_stats))
+
+  def testComputeStatsRebuildsStaleTFRecordCache(self):
+    input_path = self._copyTrainData()
+    cache_pattern = input_path + '.tfrecord-*'
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=input_path, stats_path=stats_path, use_tfrecord_cache=True)
+
+    # Replace the csv with its first 10 rows and make the cache older than it.
+    with open(_TRAIN_DATA_PATH) as f:
+      lines = f.readlines()[:11]
+    with open(input_path, 'w') as f:
+      f.writelines(lines)
+    for cache_file in file_io.get_matching_files(cache_pattern):
+      os.utime(cache_file, (0, 0))
+
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=input_path, stats_path=stats_path, use_tfrecord_cache=True)
+
+    stats = tfdv_analyze_and_validate._load_statistics(stats_path)
+    self.assertEqual(10, stats.datasets[0].num_examples)
+    for cache_file in file_io.get_matching_files(cache_pattern):
+      self.assertTrue(
+          tfdv_analyze_and_validate._is_newer(cache_file, input_path))
+
+  def testComputeStatsRebuildsIncompleteTFRecordCache(self):
+    input_path = self._copyTrainData()
+    cache_prefix = input_path + '.tfrecord'
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    # A leftover shard of a cache that was written with five shards.
+    file_io.write_string_to_file(cache_prefix + '-00004-of-00005', '')
+
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=input_path, stats_path=stats_path, use_tfrecord_cache=True)
+
+    self.assertNotIn(cache_prefix + '-00004-of-00005',
+                     file_io.get_matching_files(cache_prefix + '-*'))
+    self._assertTrainStats(
+        tfdv_analyze_and_validate._load_statistics(stats_path))
+
+  def testIsTFRecordCacheValid(self):
+    input_path = self._copyTrainData()
+    os.utime(input_path, (0, 0))
+    cache_prefix = input_path + '.tfrecord'
+    cache_files = [
+        cache_prefix + '-00000-of-00002', cache_prefix + '-00001-of-00002'
+    ]
+    for cache_file in cache_files:
+      file_io.write_string_to_file(cache_file, '')
+
+    self.assertTrue(
+        tfdv_analyze_and_validate._is_tfrecord_cache_valid(
+            cache_files, input_path))
+    self.assertFalse(
+        tfdv_analyze_and_validate._is_tfrecord_cache_valid(
+            cache_files[:1], input_path))
+    self.assertFalse(
+        tfdv_analyze_and_validate._is_tfrecord_cache_valid([], input_path))
+
+  def testComputeStatsWithTFRecordCacheRejectsPattern(self):
+    with self.assertRaises(ValueError):
+      tfdv_analyze_and_validate.compute_stats(
+          input_handle=os.path.join(_DATA_DIR_PATH, '*', 'data.csv'),
+          stats_path=os.path.join(self._working_dir, 'stats.pb'),
+          use_tfrecord_cache=True)
+
+  def testMakePushdownSql(self):
+    sql = tfdv_analyze_and_validate._make_pushdown_sql('SELECT * FROM t')
+
+    aliases = re.findall(r' AS (\w+)', sql)
+    expected_aliases = ['num_examples']
+    for column in taxi.CSV_COLUMN_NAMES:
+      if tfdv_analyze_and_validate._COLUMN_FEATURE_TYPES[column] == _STRING:
+        suffixes = _STRING_ALIASES
+      else:
+        suffixes = _NUMERIC_ALIASES
+      expected_aliases.extend(column + '_' + suffix for suffix in suffixes)
+    self.assertCountEqual(expected_aliases, aliases)
+    self.assertIn(
+        'APPROX_TOP_COUNT(company, {})'.format(
+            tfdv_analyze_and_validate._NUM_TOP_VALUES + 1), sql)
+    self.assertTrue(sql.endswith('FROM (SELECT * FROM t)'))
+
+  def testPushdownRowToStats(self):
+    row = _all_null_pushdown_row(100)
+    row.update({
+        'fare_num_missing': 10,
+        'fare_mean': 12.5,
+        'fare_std_dev': 3.0,
+        'fare_num_zeros': 5,
+        'fare_min': 0.0,
+        'fare_max': 50.0,
+        'fare_quantiles': [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0,
+                           50.0],
+        'company_num_missing': 10,
+        'company_unique': 2,
+        'company_top_values': [{'value': 'A', 'count': 50},
+                               {'value': None, 'count': 10},
+                               {'value': 'B', 'count': 40}],
+        'company_avg_length': 1.0,
+    })
+
+    stats = tfdv_analyze_and_validate._pushdown_row_to_stats(row)
+
+    self.assertEqual(1, len(stats.datasets))
+    dataset = stats.datasets[0]
+    self.assertEqual(100, dataset.num_examples)
+    features = {feature.name: feature for feature in dataset.features}
+    self.assertCountEqual(taxi.CSV_COLUMN_NAMES, features.keys())
+
+    fare = features['fare']
+    self.assertEqual(_FLOAT, fare.type)
+    self.assertEqual(90, fare.num_stats.common_stats.num_non_missing)
+    self.assertEqual(10, fare.num_stats.common_stats.num_missing)
+    self.assertEqual(1, fare.num_stats.common_stats.max_num_values)
+    self.assertEqual(90, fare.num_stats.common_stats.tot_num_values)
+    self.assertAlmostEqual(12.5, fare.num_stats.mean)
+    self.assertAlmostEqual(3.0, fare.num_stats.std_dev)
+    self.assertEqual(5, fare.num_stats.num_zeros)
+    self.assertAlmostEqual(50.0, fare.num_stats.max)
+    self.assertAlmostEqual(5.0, fare.num_stats.median)
+    self.assertEqual(1, len(fare.num_stats.histograms))
+    histogram = fare.num_stats.histograms[0]
+    self.assertEqual(statistics_pb2.Histogram.QUANTILES, histogram.type)
+    self.assertEqual(10, len(histogram.buckets))
+    self.assertAlmostEqual(9.0, histogram.buckets[0].sample_count)
+    self.assertAlmostEqual(9.0, histogram.buckets[-1].low_value)
+    self.assertAlmostEqual(50.0, histogram.buckets[-1].high_value)
+
+    company = features['company']
+    self.assertEqual(_STRING, company.type)
+    self.assertEqual(90, company.string_stats.common_stats.num_non_missing)
+    self.assertEqual(2, company.string_stats.unique)
+    self.assertAlmostEqual(1.0, company.string_stats.avg_length)
+    self.assertEqual(
+        [('A', 50), ('B', 40)],
+        [(value.value, value.frequency)
+         for value in company.string_stats.top_values])
+    self.assertEqual(
+        [(0, 0, 'A', 50), (1, 1, 'B', 40)],
+        [(bucket.low_rank, bucket.high_rank, bucket.label, bucket.sample_count)
+         for bucket in company.string_stats.rank_histogram.buckets])
+
+    tips = features['tips']
+    self.assertEqual(_FLOAT, tips.type)
+    self.assertEqual(0, tips.num_stats.common_stats.num_non_missing)
+    self.assertEqual(100, tips.num_stats.common_stats.num_missing)
+    self.assertEqual(0, tips.num_stats.common_stats.max_num_values)
+    self.assertEqual(0, tips.num_stats.mean)
+    self.assertFalse(tips.num_stats.histograms)
+
+    payment_type = features['payment_type']
+    self.assertEqual(_STRING, payment_type.type)
+    self.assertEqual(0, payment_type.string_stats.common_stats.num_non_missing)
+    self.assertEqual(0, payment_type.string_stats.unique)
+    self.assertFalse(payment_type.string_stats.top_values)
+    self.assertFalse(payment_type.string_stats.rank_histogram.buckets)
+
+  def _writeSchemas(self, text_feature_name, binary_feature_name):
+    """Writes a text schema and a differing binary copy next to it."""
+    schema_path = os.path.join(self._working_dir, 'schema.pbtxt')
+    text_schema = schema_pb2.Schema()
+    text_schema.feature.add(name=text_feature_name)
+    file_io.write_string_to_file(schema_path,
+                                 text_format.MessageToString(text_schema))
+    if binary_feature_name:
+      binary_schema = schema_pb2.Schema()
+      binary_schema.feature.add(name=binary_feature_name)
+      file_io.write_string_to_file(schema_path + '.pb',
+                                   binary_schema.SerializeToString())
+    return schema_path
+
+  def testReadSchemaReusesBinaryCopy(self):
+    schema_path = self._writeSchemas('text', 'binary')
+    os.utime(schema_path, (0, 0))
+
+    schema = tfdv_analyze_and_validate._read_schema(schema_path)
+
+    self.assertEqual('binary', schema.feature[0].name)
+
+  def testReadSchemaRefreshesStaleBinaryCopy(self):
+    schema_path = self._writeSchemas('text', 'binary')
+    os.utime(schema_path + '.pb', (0, 0))
+
+    schema = tfdv_analyze_and_validate._read_schema(schema_path)
+
+    self.assertEqual('text', schema.feature[0].name)
+    self.assertEqual(
+        'text',
+        tfdv_analyze_and_validate._read_schema(schema_path).feature[0].name)
+    binary_schema = schema_pb2.Schema.FromString(
+        file_io.FileIO(schema_path + '.pb', 'rb').read())
+    self.assertEqual('text', binary_schema.feature[0].name)
+
+  def testReadSchemaWithUnwritableBinaryCopy(self):
+    schema_path = self._writeSchemas('text', None)
+
+    with tf.test.mock.patch.object(
+        tfdv_analyze_and_validate.file_io,
+        'write_string_to_file',
+        side_effect=tf.errors.PermissionDeniedError(None, None, 'denied')):
+      schema = tfdv_analyze_and_validate._read_schema(schema_path)
+
+    self.assertEqual('text', schema.feature[0].name)
+    self.assertFalse(file_io.file_exists(schema_path + '.pb'))
+
+  def testComputeStatsSmallCsv(self):
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=_TRAIN_DATA_PATH, stats_path=stats_path)
+
+    self._assertTrainStats(
+        tfdv_analyze_and_validate._load_statistics(stats_path))
+
+  def testComputeStatsBeamPipeline(self):
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=_TRAIN_DATA_PATH,
+        stats_path=stats_path,
+        small_csv_max_bytes=0)
+
+    self._assertTrainStats(
+        tfdv_analyze_and_validate._load_statistics(stats_path))
+
+  def testInferAndValidate(self):
+    stats_path = os.path.join(self._working_dir, 'stats.pb')
+    schema_path = os.path.join(self._working_dir, 'schema.pbtxt')
+    anomalies_path = os.path.join(self._working_dir, 'anomalies.pbtxt')
+    tfdv_analyze_and_validate.compute_stats(
+        input_handle=_TRAIN_DATA_PATH, stats_path=stats_path)
+
+    with tf.test.mock.patch.object(
+        tfdv_analyze_and_validate,
+        '_load_statistics',
+        wraps=tfdv_analyze_and_validate._load_statistics) as load_statistics:
+      tfdv_analyze_and_validate.infer_and_validate(stats_path, schema_path,
+                                                   anomalies_path)
+
+    load_statistics.assert_called_once_with(stats_path)
+    schema = text_format.Parse(
+        file_io.read_file_to_string(schema_path), schema_pb2.Schema())
+    self.assertCountEqual(taxi.CSV_COLUMN_NAMES,
+                          [feature.name for feature in schema.feature])
+    self.assertTrue(file_io.file_exists(anomalies_path))
+
+  def testWithRunnerV2ExperimentsAddsExperimentsForDataflow(self):
+    pipeline_args = ['--runner=DataflowRunner', '--project=p']
+
+    self.assertEqual(
+        pipeline_args + [
+            '--experiments=use_runner_v2',
+            '--experiments=use_sibling_sdk_workers'
+        ],
+        tfdv_analyze_and_validate._with_runner_v2_experiments(pipeline_args))
+
+  def testWithRunnerV2ExperimentsIgnoresOtherRunners(self):
+    for pipeline_args in (None, [], ['--runner=DirectRunner']):
+      self.assertEqual(
+          list(pipeline_args or []),
+          tfdv_analyze_and_validate._with_runner_v2_experiments(pipeline_args))
+
+  def testWithRunnerV2ExperimentsKeepsPassedExperiments(self):
+    for pipeline_args in (
+        ['--runner=DataflowRunner',
+         '--experiments=shuffle_mode=service,use_runner_v2'],
+        ['--runner=DataflowRunner', '--experiments=use_runner_v2'],
+    ):
+      self.assertEqual(
+          pipeline_args + ['--experiments=use_sibling_sdk_workers'],
+          tfdv_analyze_and_validate._with_runner_v2_experiments(pipeline_args))
+
+    pipeline_args = [
+        '--runner=DataflowRunner',
+        '--experiments=use_sibling_sdk_workers,use_runner_v2'
+    ]
+    self.assertEqual(
+        pipeline_args,
+        tfdv_analyze_and_validate._with_runner_v2_experiments(pipeline_args))
+
+
+if __name__ == '__main__':
+  tf.test.main()
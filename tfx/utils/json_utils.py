@@ -54,6 +54,10 @@ class Jsonable(with_metaclass(abc.ABCMeta, object)):
   override `to_json_dict` and `from_json_dict` to customize the implementation.
   """
 
+  # Allows subclasses to declare their own __slots__ and drop the per-instance
+  # __dict__; such subclasses must override `to_json_dict`.
+  __slots__ = ()
+
   def to_json_dict(self) -> Dict[Text, Any]:
     """Convert from an object to a JSON serializable dictionary."""
     return self.__dict__